@@ -32,204 +32,463 @@ client side validation and a more sophisticated UI framework.
 """
 
 import os
+import queue
+import socket
 import sqlite3
 import datetime
+import hashlib
+import threading
 import urllib.parse
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from collections import defaultdict
+from contextlib import contextmanager
+from html import escape as _esc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from string import Template
 
 # Path to the directory containing this script
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(ROOT_DIR, "database.db")
 
+# Maximum number of SQLite connections kept open and shared between requests.
+POOL_SIZE = 8
+
+# Pragmas applied to every pooled connection. WAL lets readers proceed while
+# a write is in progress, and the larger cache keeps hot pages in memory.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Bump when init_db() gains new tables or indexes so existing databases are
+# brought up to date on the next start.
+SCHEMA_VERSION = 1
+
+# Number of prepared statements each connection keeps cached for reuse.
+STATEMENT_CACHE_SIZE = 256
+
+# Queries used on the hot read paths. Keeping them as constants means every
+# request passes the identical SQL text, so the per-connection statement
+# cache can reuse the compiled statement.
+SQL_COUNTS = "SELECT (SELECT COUNT(*) FROM bookings), (SELECT COUNT(*) FROM invoices)"
+
+# has_interim is 1 when any service or misc item on the booking mentions an
+# interim service, which shortens the next service interval.
+SQL_INVOICE_VIEW = """
+    SELECT i.invoice_number, i.issue_date, i.total_ex_vat, i.total_vat, i.total_inc, i.status,
+           b.id, b.booking_date, c.first_name, c.last_name, c.phone, c.email, c.address,
+           v.vrm, v.make, v.model, v.mileage,
+           EXISTS (
+               SELECT 1 FROM booking_items bi JOIN services s ON bi.service_id = s.id
+               WHERE bi.booking_id = b.id AND s.name LIKE '%interim%'
+           ) OR EXISTS (
+               SELECT 1 FROM misc_items mi
+               WHERE mi.booking_id = b.id AND mi.name LIKE '%interim%'
+           ) AS has_interim
+    FROM invoices i
+    JOIN bookings b ON i.booking_id = b.id
+    JOIN customers c ON b.customer_id = c.id
+    JOIN vehicles v ON b.vehicle_id = v.id
+    WHERE i.id = ?
+"""
 
-def init_db():
-    """Create database tables and seed default data if they do not exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # Create tables
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            phone TEXT,
-            email TEXT,
-            address TEXT
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS vehicles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            vrm TEXT NOT NULL,
-            make TEXT,
-            model TEXT,
-            mileage INTEGER,
-            FOREIGN KEY (customer_id) REFERENCES customers(id)
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS services (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            unit_price REAL NOT NULL,
-            vat_rate REAL NOT NULL
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            vehicle_id INTEGER NOT NULL,
-            booking_date TEXT NOT NULL,
-            notes TEXT,
-            status TEXT NOT NULL DEFAULT 'booked',
-            FOREIGN KEY (customer_id) REFERENCES customers(id),
-            FOREIGN KEY (vehicle_id) REFERENCES vehicles(id)
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS booking_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER NOT NULL,
-            service_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit_price REAL NOT NULL,
-            vat_rate REAL NOT NULL,
-            FOREIGN KEY (booking_id) REFERENCES bookings(id),
-            FOREIGN KEY (service_id) REFERENCES services(id)
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER NOT NULL,
-            invoice_number TEXT NOT NULL,
-            issue_date TEXT NOT NULL,
-            total_ex_vat REAL NOT NULL,
-            total_vat REAL NOT NULL,
-            total_inc REAL NOT NULL,
-            status TEXT NOT NULL DEFAULT 'unpaid',
-            FOREIGN KEY (booking_id) REFERENCES bookings(id)
-        );
-        """
-    )
+# Service items followed by misc (custom) items, which have an empty
+# description. Line totals excluding VAT and the VAT amount are calculated
+# by SQLite.
+SQL_INVOICE_ITEMS = """
+    SELECT s.name, s.description, bi.quantity, bi.unit_price, bi.vat_rate,
+           bi.quantity * bi.unit_price AS ex, bi.quantity * bi.unit_price * bi.vat_rate AS vat
+    FROM booking_items bi
+    JOIN services s ON bi.service_id = s.id
+    WHERE bi.booking_id = ?
+    UNION ALL
+    SELECT name, '', quantity, unit_price, vat_rate,
+           quantity * unit_price, quantity * unit_price * vat_rate
+    FROM misc_items
+    WHERE booking_id = ?
+"""
 
-    # Table for miscellaneous parts/items associated with a booking. These allow
-    # custom parts to be priced separately from standard services. Each row
-    # records the part name, quantity, unit price and VAT rate.
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS misc_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit_price REAL NOT NULL,
-            vat_rate REAL NOT NULL,
-            FOREIGN KEY (booking_id) REFERENCES bookings(id)
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        );
-        """
+SQL_LIST_INVOICES = """
+    SELECT i.id, i.invoice_number, i.issue_date, i.total_inc, i.status, c.first_name, c.last_name
+    FROM invoices i
+    JOIN bookings b ON i.booking_id = b.id
+    JOIN customers c ON b.customer_id = c.id
+    ORDER BY i.issue_date DESC, i.id DESC
+"""
+
+# The customer's full name and whether the booking can still be canceled are
+# worked out by SQLite so the row builder only has to format the values.
+SQL_LIST_BOOKINGS = """
+    SELECT b.id, b.booking_date, b.status, TRIM(c.first_name || ' ' || c.last_name) AS customer_name,
+           v.vrm, IFNULL(i.invoice_number, '') AS invoice_number, i.id AS invoice_id,
+           CASE WHEN b.status != 'canceled' THEN 1 ELSE 0 END AS cancellable
+    FROM bookings b
+    JOIN customers c ON b.customer_id = c.id
+    JOIN vehicles v ON b.vehicle_id = v.id
+    LEFT JOIN invoices i ON i.booking_id = b.id
+    ORDER BY b.booking_date DESC, b.id DESC
+"""
+
+_POOL = queue.Queue(maxsize=POOL_SIZE)
+_POOL_LOCK = threading.Lock()
+_pool_created = 0
+
+# Settings rarely change, so they are loaded once and kept in memory until
+# invalidate_settings() is called after a write to the settings table.
+_SETTINGS_CACHE = None
+_PAYMENT_TERMS_CACHE = None
+_SETTINGS_LOCK = threading.Lock()
+
+# Compiled page templates keyed by file name, stored as (mtime, format string).
+# The modification time is only tracked when running with DEV=1.
+_TEMPLATE_CACHE = {}
+DEV_MODE = os.environ.get('DEV') == '1'
+
+# Static assets served from memory, populated by load_static_files() when the
+# server starts. Browsers may cache them for a day and revalidate via ETag.
+_STATIC = {}
+STATIC_CACHE_CONTROL = 'public, max-age=86400'
+
+# Size of each write when sending HTML responses.
+RESPONSE_CHUNK_SIZE = 65536
+
+# Upper bound on the number of fields accepted in a submitted form.
+MAX_FORM_FIELDS = 200
+
+# Inline form shown on the booking list for bookings that can be canceled.
+CANCEL_FORM_HTML = (
+    '<form method="post" action="/booking/cancel" style="display:inline;">'
+    '<input type="hidden" name="booking_id" value="{booking_id}">'
+    '<button type="submit" class="btn" onclick="return confirm(\'Are you sure you want to cancel this booking?\');">Cancel</button>'
+    '</form>'
+)
+
+
+def _open_connection():
+    """Open a new SQLite connection configured for use from the pool."""
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
     )
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
-    # Seed default company information if not present
-    cur.execute("SELECT COUNT(*) FROM settings")
-    count = cur.fetchone()[0]
-    if count == 0:
-        # Default values for company details, payment info and terms
-        default_settings = {
-            'company_name': 'Motorhouse Beds Ltd',
-            'address_line1': '87 High Street',
-            'address_line2': 'Clapham',
-            'address_city': 'Bedford',
-            'address_county': 'Bedfordshire',
-            'address_postcode': 'MK41 6AQ',
-            'phone1': '01234 225570',
-            'phone2': '07923 829234',
-            'email': 'info@motorhouse-beds.co.uk',
-            'company_number': '14696224',
-            'fca_number': '1000208',
-            # Payment methods: comma separated list shown on invoices
-            'payment_methods': 'Bank transfer, Credit/Debit card, Cash',
-            # Bank details shown on invoices
-            'bank_details': 'Sort Code: 01-02-03, Account No: 12345678',
-            # Default payment terms (due date offset in days)
-            'payment_terms_days': '14',
-            # Terms and conditions to show on invoices
-            'terms_conditions': 'Payment is due within 14 days of the invoice date. Late payments may incur interest at 2% per month. All goods remain the property of Motorhouse Beds Ltd until paid for in full.'
-        }
-        cur.executemany(
-            "INSERT INTO settings(key, value) VALUES (?, ?)",
-            list(default_settings.items())
-        )
 
-    # Seed default services if table empty
-    cur.execute("SELECT COUNT(*) FROM services")
-    svc_count = cur.fetchone()[0]
-    if svc_count == 0:
-        services = [
-            ('Full Service', 'Comprehensive vehicle servicing including oil and filter change, safety checks and diagnostics', 200.0, 0.20),
-            ('Interim Service', 'Basic service including oil and filter change and essential safety checks', 120.0, 0.20),
-            ('MOT Test', 'Annual Ministry of Transport test to ensure roadworthiness', 54.85, 0.00),
-            ('Brake Pads Replacement', 'Replace front or rear brake pads as needed', 150.0, 0.20),
-            ('Diagnostics', 'Computer diagnostics and fault code reading', 60.0, 0.20)
-        ]
-        cur.executemany(
-            "INSERT INTO services(name, description, unit_price, vat_rate) VALUES (?, ?, ?, ?)",
-            services
+@contextmanager
+def get_conn():
+    """Check out a pooled database connection for the duration of a block.
+
+    Connections are created lazily up to POOL_SIZE and then reused, so each
+    request avoids the cost of opening and closing the database file. Any
+    transaction left open by the caller is rolled back before the connection
+    is returned to the pool.
+    """
+    global _pool_created
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        conn = None
+        with _POOL_LOCK:
+            if _pool_created < POOL_SIZE:
+                conn = _open_connection()
+                _pool_created += 1
+        if conn is None:
+            conn = _POOL.get()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        _POOL.put(conn)
+
+
+def init_db():
+    """Create database tables and seed default data if they do not exist.
+
+    The whole schema is created and seeded in a single transaction, after
+    which the database's user_version is set to SCHEMA_VERSION. Later starts
+    see the current version and skip the work entirely.
+    """
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("PRAGMA user_version")
+        if cur.fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        # Create tables and indexes. The script opens the transaction that
+        # the seeding below also runs in.
+        cur.executescript(
+            """
+            BEGIN;
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                phone TEXT,
+                email TEXT,
+                address TEXT
+            );
+            CREATE TABLE IF NOT EXISTS vehicles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                vrm TEXT NOT NULL,
+                make TEXT,
+                model TEXT,
+                mileage INTEGER,
+                FOREIGN KEY (customer_id) REFERENCES customers(id)
+            );
+            CREATE TABLE IF NOT EXISTS services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                unit_price REAL NOT NULL,
+                vat_rate REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                vehicle_id INTEGER NOT NULL,
+                booking_date TEXT NOT NULL,
+                notes TEXT,
+                status TEXT NOT NULL DEFAULT 'booked',
+                FOREIGN KEY (customer_id) REFERENCES customers(id),
+                FOREIGN KEY (vehicle_id) REFERENCES vehicles(id)
+            );
+            CREATE TABLE IF NOT EXISTS booking_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER NOT NULL,
+                service_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_price REAL NOT NULL,
+                vat_rate REAL NOT NULL,
+                FOREIGN KEY (booking_id) REFERENCES bookings(id),
+                FOREIGN KEY (service_id) REFERENCES services(id)
+            );
+            CREATE TABLE IF NOT EXISTS invoices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER NOT NULL,
+                invoice_number TEXT NOT NULL,
+                issue_date TEXT NOT NULL,
+                total_ex_vat REAL NOT NULL,
+                total_vat REAL NOT NULL,
+                total_inc REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'unpaid',
+                FOREIGN KEY (booking_id) REFERENCES bookings(id)
+            );
+
+            -- Miscellaneous parts/items associated with a booking. These allow
+            -- custom parts to be priced separately from standard services. Each
+            -- row records the part name, quantity, unit price and VAT rate.
+            CREATE TABLE IF NOT EXISTS misc_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_price REAL NOT NULL,
+                vat_rate REAL NOT NULL,
+                FOREIGN KEY (booking_id) REFERENCES bookings(id)
+            );
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+
+            -- Index foreign keys and list ordering columns so the joins used by
+            -- the invoice and booking pages do not fall back to full table scans.
+            CREATE INDEX IF NOT EXISTS idx_vehicles_customer ON vehicles(customer_id);
+            CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings(customer_id);
+            CREATE INDEX IF NOT EXISTS idx_bookings_vehicle ON bookings(vehicle_id);
+            CREATE INDEX IF NOT EXISTS idx_invoices_booking ON invoices(booking_id);
+            CREATE INDEX IF NOT EXISTS idx_bi_booking ON booking_items(booking_id);
+            CREATE INDEX IF NOT EXISTS idx_mi_booking ON misc_items(booking_id);
+            CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings(booking_date DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS idx_invoices_issue ON invoices(issue_date DESC, id DESC);
+            """
         )
 
-    conn.commit()
-    conn.close()
+        # Seed default company information if not present
+        cur.execute("SELECT COUNT(*) FROM settings")
+        count = cur.fetchone()[0]
+        if count == 0:
+            # Default values for company details, payment info and terms
+            default_settings = {
+                'company_name': 'Motorhouse Beds Ltd',
+                'address_line1': '87 High Street',
+                'address_line2': 'Clapham',
+                'address_city': 'Bedford',
+                'address_county': 'Bedfordshire',
+                'address_postcode': 'MK41 6AQ',
+                'phone1': '01234 225570',
+                'phone2': '07923 829234',
+                'email': 'info@motorhouse-beds.co.uk',
+                'company_number': '14696224',
+                'fca_number': '1000208',
+                # Payment methods: comma separated list shown on invoices
+                'payment_methods': 'Bank transfer, Credit/Debit card, Cash',
+                # Bank details shown on invoices
+                'bank_details': 'Sort Code: 01-02-03, Account No: 12345678',
+                # Default payment terms (due date offset in days)
+                'payment_terms_days': '14',
+                # Terms and conditions to show on invoices
+                'terms_conditions': 'Payment is due within 14 days of the invoice date. Late payments may incur interest at 2% per month. All goods remain the property of Motorhouse Beds Ltd until paid for in full.'
+            }
+            cur.executemany(
+                "INSERT INTO settings(key, value) VALUES (?, ?)",
+                list(default_settings.items())
+            )
+
+        # Seed default services if table empty
+        cur.execute("SELECT COUNT(*) FROM services")
+        svc_count = cur.fetchone()[0]
+        if svc_count == 0:
+            services = [
+                ('Full Service', 'Comprehensive vehicle servicing including oil and filter change, safety checks and diagnostics', 200.0, 0.20),
+                ('Interim Service', 'Basic service including oil and filter change and essential safety checks', 120.0, 0.20),
+                ('MOT Test', 'Annual Ministry of Transport test to ensure roadworthiness', 54.85, 0.00),
+                ('Brake Pads Replacement', 'Replace front or rear brake pads as needed', 150.0, 0.20),
+                ('Diagnostics', 'Computer diagnostics and fault code reading', 60.0, 0.20)
+            ]
+            cur.executemany(
+                "INSERT INTO services(name, description, unit_price, vat_rate) VALUES (?, ?, ?, ?)",
+                services
+            )
+
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    invalidate_settings()
+
+
+def invalidate_settings():
+    """Discard cached settings so the next lookup reloads them from the database."""
+    global _SETTINGS_CACHE, _PAYMENT_TERMS_CACHE
+    with _SETTINGS_LOCK:
+        _SETTINGS_CACHE = None
+        _PAYMENT_TERMS_CACHE = None
 
 
 def get_settings():
-    """Return a dictionary of settings from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT key, value FROM settings")
-    settings = {row[0]: row[1] for row in cur.fetchall()}
-    conn.close()
-    return settings
-
-
-def next_invoice_number():
-    """Generate a new invoice number based on the latest invoice ID and current date."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM invoices ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
-    next_id = (row[0] + 1) if row else 1
-    conn.close()
-    date_str = datetime.date.today().strftime('%Y%m%d')
-    return f"INV{date_str}-{next_id:03d}"
+    """Return a dictionary of settings, loading it from the database on first use."""
+    global _SETTINGS_CACHE
+    settings = _SETTINGS_CACHE
+    if settings is not None:
+        return settings
+    with _SETTINGS_LOCK:
+        if _SETTINGS_CACHE is None:
+            with get_conn() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT key, value FROM settings")
+                _SETTINGS_CACHE = {row[0]: row[1] for row in cur.fetchall()}
+        return _SETTINGS_CACHE
+
+
+def get_payment_terms_days():
+    """Return the configured payment terms in days (default 14)."""
+    global _PAYMENT_TERMS_CACHE
+    days = _PAYMENT_TERMS_CACHE
+    if days is None:
+        try:
+            days = int(get_settings().get('payment_terms_days', '14'))
+        except ValueError:
+            days = 14
+        _PAYMENT_TERMS_CACHE = days
+    return days
+
+
+def load_static_files():
+    """Read every file under the static directory into memory.
+
+    The result maps URL paths (e.g. /static/style.css) to a tuple of
+    (content, mime type, etag) so requests can be answered without touching
+    the filesystem.
+    """
+    static_dir = os.path.join(ROOT_DIR, 'static')
+    files = {}
+    for dirpath, _dirnames, filenames in os.walk(static_dir):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            if filename.endswith('.css'):
+                mime = 'text/css'
+            elif filename.endswith('.js'):
+                mime = 'application/javascript'
+            else:
+                mime = 'application/octet-stream'
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            rel_path = os.path.relpath(file_path, ROOT_DIR).replace(os.sep, '/')
+            etag = hashlib.md5(content).hexdigest()
+            files['/' + rel_path] = (content, mime, etag)
+    return files
+
+
+def _e(value):
+    """HTML-escape a user-supplied string, treating None or empty as ''."""
+    return _esc(value) if value else ''
+
+
+def _parse_ymd(value):
+    """Parse a YYYY-MM-DD string into a date, raising ValueError if invalid.
+
+    Slicing the fixed-width fields is much cheaper than datetime.strptime.
+    """
+    year, month, day = value[:4], value[5:7], value[8:10]
+    if (len(value) != 10 or not value.isascii() or value[4] != '-' or value[7] != '-'
+            or not (year.isdigit() and month.isdigit() and day.isdigit())):
+        raise ValueError(f'invalid date: {value!r}')
+    return datetime.date(int(year), int(month), int(day))
+
+
+def compile_template(source):
+    """Convert $name / ${name} placeholders into a str.format_map string.
+
+    Literal braces are doubled so they survive formatting, "$$" becomes a
+    plain "$", and anything Template would not treat as a placeholder is
+    kept as written.
+    """
+    parts = []
+    pos = 0
+    for match in Template.pattern.finditer(source):
+        parts.append(source[pos:match.start()].replace('{', '{{').replace('}', '}}'))
+        name = match.group('named') or match.group('braced')
+        if name is not None:
+            parts.append('{' + name + '}')
+        elif match.group('escaped') is not None:
+            parts.append('$')
+        else:
+            parts.append(match.group(0))
+        pos = match.end()
+    parts.append(source[pos:].replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts)
+
+
+def load_template(template_name):
+    """Return the compiled format string for a file in the templates directory.
+
+    Templates are read and compiled once and then served from memory. When
+    the DEV environment variable is set to 1 the file's modification time is
+    checked on each call so edits are picked up without a restart.
+    """
+    template_path = os.path.join(ROOT_DIR, 'templates', template_name)
+    cached = _TEMPLATE_CACHE.get(template_name)
+    if cached is not None and not DEV_MODE:
+        return cached[1]
+    mtime = os.path.getmtime(template_path) if DEV_MODE else None
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template = compile_template(f.read())
+    _TEMPLATE_CACHE[template_name] = (mtime, template)
+    return template
 
 
 class ServiceRequestHandler(BaseHTTPRequestHandler):
     """HTTP request handler implementing a simple routing mechanism."""
 
+    # Keep connections open between requests so a page and its stylesheet
+    # can be fetched over one TCP connection. Every response must therefore
+    # send an accurate Content-Length.
+    protocol_version = 'HTTP/1.1'
+
     def do_GET(self):
         parsed_path = urllib.parse.urlparse(self.path)
         path = parsed_path.path
@@ -257,7 +516,13 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
         path = parsed_path.path
         content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length)
-        fields = urllib.parse.parse_qs(post_data.decode())
+        try:
+            fields = dict(urllib.parse.parse_qsl(
+                post_data.decode('utf-8', 'replace'), max_num_fields=MAX_FORM_FIELDS
+            ))
+        except ValueError:
+            self.send_error(400, 'Too many form fields')
+            return
         if path == '/booking/new':
             self.process_new_booking(fields)
         elif path == '/booking/cancel':
@@ -266,45 +531,41 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
             self.send_error(404, 'Page not found')
 
     def serve_static(self, path):
-        """Serve static files such as CSS."""
-        static_path = os.path.join(ROOT_DIR, path.lstrip('/'))
-        if os.path.isfile(static_path):
-            if static_path.endswith('.css'):
-                mime = 'text/css'
-            elif static_path.endswith('.js'):
-                mime = 'application/javascript'
-            else:
-                mime = 'application/octet-stream'
-            with open(static_path, 'rb') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', mime)
-            self.send_header('Content-Length', len(content))
-            self.end_headers()
-            self.wfile.write(content)
-        else:
+        """Serve static files such as CSS from the in-memory cache."""
+        entry = _STATIC.get(path)
+        if entry is None:
             self.send_error(404, 'File not found')
+            return
+        content, mime, etag = entry
+        quoted_etag = f'"{etag}"'
+        if self.headers.get('If-None-Match') == quoted_etag:
+            self.send_response(304)
+            self.send_header('ETag', quoted_etag)
+            self.send_header('Cache-Control', STATIC_CACHE_CONTROL)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', mime)
+        self.send_header('Content-Length', len(content))
+        self.send_header('ETag', quoted_etag)
+        self.send_header('Cache-Control', STATIC_CACHE_CONTROL)
+        self.end_headers()
+        self.wfile.write(content)
 
     def render_template(self, template_name, **context):
         """Render an HTML template with the given context variables."""
-        template_path = os.path.join(ROOT_DIR, 'templates', template_name)
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        template = Template(template_content)
-        # Replace placeholders using template substitute. Any missing variable
-        # remains unchanged (safe_substitute). Convert None to empty string.
-        safe_context = {k: ('' if v is None else v) for k, v in context.items()}
-        return template.safe_substitute(safe_context)
+        template = load_template(template_name)
+        # Fill placeholders with format_map. Missing variables and None
+        # values render as an empty string.
+        safe_context = defaultdict(str, {k: ('' if v is None else v) for k, v in context.items()})
+        return template.format_map(safe_context)
 
     def handle_dashboard(self):
         """Display the dashboard with counts and actions."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM bookings")
-        booking_count = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM invoices")
-        invoice_count = cur.fetchone()[0]
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(SQL_COUNTS)
+            booking_count, invoice_count = cur.fetchone()
         settings = get_settings()
         html = self.render_template(
             'dashboard.html',
@@ -316,227 +577,203 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
 
     def handle_new_booking_form(self):
         """Render the booking form with dynamic list of services."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT id, name, description, unit_price, vat_rate FROM services")
-        services = cur.fetchall()
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, name, description, unit_price, vat_rate FROM services")
+            services = cur.fetchall()
         # Build HTML for service rows
-        service_rows = ''
-        for svc in services:
-            svc_id, name, description, price, vat = svc
-            row = f'''<tr>
-                <td>{name}<br><small>{description}</small></td>
+        service_rows = ''.join(
+            f'''<tr>
+                <td>{_e(name)}<br><small>{_e(description)}</small></td>
                 <td>£{price:.2f}</td>
                 <td>{int(vat * 100)}%</td>
                 <td><input type="number" name="qty_{svc_id}" min="0" max="10" value="0" style="width:60px"></td>
             </tr>'''
-            service_rows += row
+            for svc_id, name, description, price, vat in services
+        )
         html = self.render_template('booking_form.html', services_rows=service_rows)
         self.respond_html(html)
 
     def process_new_booking(self, fields):
         """Handle POST submission for new booking and create associated records."""
         # Extract customer fields
-        first_name = fields.get('first_name', [''])[0].strip()
-        last_name = fields.get('last_name', [''])[0].strip()
-        phone = fields.get('phone', [''])[0].strip()
-        email = fields.get('email', [''])[0].strip()
-        address = fields.get('address', [''])[0].strip()
+        first_name = fields.get('first_name', '').strip()
+        last_name = fields.get('last_name', '').strip()
+        phone = fields.get('phone', '').strip()
+        email = fields.get('email', '').strip()
+        address = fields.get('address', '').strip()
         # Vehicle fields
-        vrm = fields.get('vrm', [''])[0].strip().upper()
-        make = fields.get('make', [''])[0].strip()
-        model = fields.get('model', [''])[0].strip()
-        mileage = fields.get('mileage', ['0'])[0].strip()
+        vrm = fields.get('vrm', '').strip().upper()
+        make = fields.get('make', '').strip()
+        model = fields.get('model', '').strip()
+        mileage = fields.get('mileage', '0').strip()
+        try:
+            mileage_val = int(mileage)
+        except ValueError:
+            mileage_val = None
+        if mileage_val is not None and mileage_val < 0:
+            mileage_val = None
         # Booking date: allow custom date if provided, else default to today
-        date_str = fields.get('booking_date', [''])[0].strip()
+        today = datetime.date.today()
+        date_str = fields.get('booking_date', '').strip()
         if date_str:
             # Use provided date; validate format (YYYY-MM-DD)
             try:
-                datetime.datetime.strptime(date_str, '%Y-%m-%d')
-                booking_date = date_str
+                booking_date = _parse_ymd(date_str).isoformat()
             except ValueError:
-                booking_date = datetime.date.today().isoformat()
+                booking_date = today.isoformat()
         else:
-            booking_date = datetime.date.today().isoformat()
-        notes = fields.get('notes', [''])[0].strip()
-
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        # Insert customer
-        cur.execute(
-            "INSERT INTO customers(first_name, last_name, phone, email, address) VALUES (?,?,?,?,?)",
-            (first_name, last_name, phone, email, address)
-        )
-        customer_id = cur.lastrowid
-        # Insert vehicle
-        cur.execute(
-            "INSERT INTO vehicles(customer_id, vrm, make, model, mileage) VALUES (?,?,?,?,?)",
-            (customer_id, vrm, make, model, int(mileage) if mileage.isdigit() else None)
-        )
-        vehicle_id = cur.lastrowid
-        # Insert booking
-        cur.execute(
-            "INSERT INTO bookings(customer_id, vehicle_id, booking_date, notes, status) VALUES (?,?,?,?,?)",
-            (customer_id, vehicle_id, booking_date, notes, 'booked')
-        )
-        booking_id = cur.lastrowid
-        # Insert booking items and compute totals
-        total_ex_vat = 0.0
-        total_vat = 0.0
-        cur.execute("SELECT id, unit_price, vat_rate FROM services")
-        services = cur.fetchall()
-        for svc_id, unit_price, vat_rate in services:
-            qty_key = f'qty_{svc_id}'
-            qty_str = fields.get(qty_key, ['0'])[0]
-            try:
-                qty = int(qty_str)
-            except ValueError:
-                qty = 0
-            if qty > 0:
-                cur.execute(
+            booking_date = today.isoformat()
+        notes = fields.get('notes', '').strip()
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Current service prices are looked up server side rather than
+            # trusted from the form.
+            cur.execute("SELECT id, unit_price, vat_rate FROM services")
+            services = cur.fetchall()
+            # Run all inserts for the booking in one transaction
+            conn.execute('BEGIN')
+            # Insert customer
+            cur.execute(
+                "INSERT INTO customers(first_name, last_name, phone, email, address) VALUES (?,?,?,?,?)",
+                (first_name, last_name, phone, email, address)
+            )
+            customer_id = cur.lastrowid
+            # Insert vehicle
+            cur.execute(
+                "INSERT INTO vehicles(customer_id, vrm, make, model, mileage) VALUES (?,?,?,?,?)",
+                (customer_id, vrm, make, model, mileage_val)
+            )
+            vehicle_id = cur.lastrowid
+            # Insert booking
+            cur.execute(
+                "INSERT INTO bookings(customer_id, vehicle_id, booking_date, notes, status) VALUES (?,?,?,?,?)",
+                (customer_id, vehicle_id, booking_date, notes, 'booked')
+            )
+            booking_id = cur.lastrowid
+            # Insert booking items and compute totals
+            total_ex_vat = 0.0
+            total_vat = 0.0
+            rows_bi = []
+            for svc_id, unit_price, vat_rate in services:
+                qty_key = f'qty_{svc_id}'
+                qty_str = fields.get(qty_key, '0')
+                try:
+                    qty = int(qty_str)
+                except ValueError:
+                    qty = 0
+                if qty > 0:
+                    rows_bi.append((booking_id, svc_id, qty, unit_price, vat_rate))
+                    line_total = qty * unit_price
+                    line_vat = line_total * vat_rate
+                    total_ex_vat += line_total
+                    total_vat += line_vat
+            if rows_bi:
+                cur.executemany(
                     "INSERT INTO booking_items(booking_id, service_id, quantity, unit_price, vat_rate) VALUES (?,?,?,?,?)",
-                    (booking_id, svc_id, qty, unit_price, vat_rate)
+                    rows_bi
                 )
-                line_total = qty * unit_price
-                line_vat = line_total * vat_rate
-                total_ex_vat += line_total
-                total_vat += line_vat
-        # Handle up to three miscellaneous parts (custom items)
-        for i in range(1, 4):
-            name_key = f'custom_name_{i}'
-            qty_key = f'custom_qty_{i}'
-            price_key = f'custom_price_{i}'
-            vat_key = f'custom_vat_{i}'
-            name_val = fields.get(name_key, [''])[0].strip()
-            qty_val = fields.get(qty_key, ['0'])[0]
-            price_val = fields.get(price_key, [''])[0]
-            vat_val = fields.get(vat_key, [''])[0]
-            # Skip if no name
-            if not name_val:
-                continue
-            try:
-                qty_int = int(qty_val)
-            except ValueError:
-                qty_int = 0
-            try:
-                price_float = float(price_val)
-            except ValueError:
-                price_float = 0.0
-            try:
-                vat_float = float(vat_val)
-            except ValueError:
-                vat_float = 0.20  # default 20% VAT
-            if qty_int > 0 and price_float > 0:
-                cur.execute(
+            # Handle up to three miscellaneous parts (custom items)
+            rows_mi = []
+            for i in range(1, 4):
+                name_key = f'custom_name_{i}'
+                qty_key = f'custom_qty_{i}'
+                price_key = f'custom_price_{i}'
+                vat_key = f'custom_vat_{i}'
+                name_val = fields.get(name_key, '').strip()
+                qty_val = fields.get(qty_key, '0')
+                price_val = fields.get(price_key, '')
+                vat_val = fields.get(vat_key, '')
+                # Skip if no name
+                if not name_val:
+                    continue
+                try:
+                    qty_int = int(qty_val)
+                except ValueError:
+                    qty_int = 0
+                try:
+                    price_float = float(price_val)
+                except ValueError:
+                    price_float = 0.0
+                try:
+                    vat_float = float(vat_val)
+                except ValueError:
+                    vat_float = 0.20  # default 20% VAT
+                if qty_int > 0 and price_float > 0:
+                    rows_mi.append((booking_id, name_val, qty_int, price_float, vat_float))
+                    line_total = qty_int * price_float
+                    line_vat = line_total * vat_float
+                    total_ex_vat += line_total
+                    total_vat += line_vat
+            if rows_mi:
+                cur.executemany(
                     "INSERT INTO misc_items(booking_id, name, quantity, unit_price, vat_rate) VALUES (?,?,?,?,?)",
-                    (booking_id, name_val, qty_int, price_float, vat_float)
+                    rows_mi
                 )
-                line_total = qty_int * price_float
-                line_vat = line_total * vat_float
-                total_ex_vat += line_total
-                total_vat += line_vat
-        # Create invoice record
-        if total_ex_vat > 0:
-            invoice_number = next_invoice_number()
-            total_inc = total_ex_vat + total_vat
-            issue_date = datetime.date.today().isoformat()
-            cur.execute(
-                "INSERT INTO invoices(booking_id, invoice_number, issue_date, total_ex_vat, total_vat, total_inc, status) VALUES (?,?,?,?,?,?,?)",
-                (booking_id, invoice_number, issue_date, total_ex_vat, total_vat, total_inc, 'unpaid')
-            )
-            invoice_id = cur.lastrowid
-        else:
-            invoice_id = None
-        conn.commit()
-        conn.close()
+            # Create invoice record
+            if total_ex_vat > 0:
+                total_inc = total_ex_vat + total_vat
+                issue_date = today.isoformat()
+                cur.execute(
+                    "INSERT INTO invoices(booking_id, invoice_number, issue_date, total_ex_vat, total_vat, total_inc, status) VALUES (?,?,?,?,?,?,?)",
+                    (booking_id, '', issue_date, total_ex_vat, total_vat, total_inc, 'unpaid')
+                )
+                invoice_id = cur.lastrowid
+                # Derive the invoice number from the new row's ID inside the
+                # same transaction so concurrent bookings cannot collide.
+                cur.execute(
+                    "UPDATE invoices SET invoice_number = 'INV' || ? || '-' || printf('%03d', id) WHERE id = ?",
+                    (today.strftime('%Y%m%d'), invoice_id)
+                )
+            else:
+                invoice_id = None
+            conn.commit()
         # Redirect to invoice page or dashboard
         if invoice_id:
-            self.send_response(303)
-            self.send_header('Location', f'/invoice/{invoice_id}')
-            self.end_headers()
+            self.redirect(f'/invoice/{invoice_id}')
         else:
-            self.send_response(303)
-            self.send_header('Location', '/')
-            self.end_headers()
+            self.redirect('/')
 
     def handle_invoice(self, invoice_id: int):
         """Render a single invoice by ID."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        # Fetch invoice
-        cur.execute(
-            "SELECT i.invoice_number, i.issue_date, i.total_ex_vat, i.total_vat, i.total_inc, i.status, b.id, b.booking_date, c.first_name, c.last_name, c.phone, c.email, c.address, v.vrm, v.make, v.model, v.mileage\n"
-            "FROM invoices i\n"
-            "JOIN bookings b ON i.booking_id = b.id\n"
-            "JOIN customers c ON b.customer_id = c.id\n"
-            "JOIN vehicles v ON b.vehicle_id = v.id\n"
-            "WHERE i.id = ?",
-            (invoice_id,)
-        )
-        row = cur.fetchone()
-        if not row:
-            conn.close()
-            self.send_error(404, 'Invoice not found')
-            return
-        (
-            inv_number, issue_date, total_ex, total_vat, total_inc, inv_status,
-            booking_id, booking_date, cust_first, cust_last, cust_phone,
-            cust_email, cust_address, vrm, make, model, mileage
-        ) = row
-        # Fetch booking items with service details
-        cur.execute(
-            "SELECT s.name, s.description, bi.quantity, bi.unit_price, bi.vat_rate\n"
-            "FROM booking_items bi\n"
-            "JOIN services s ON bi.service_id = s.id\n"
-            "WHERE bi.booking_id = ?",
-            (booking_id,)
-        )
-        items = cur.fetchall()
-        # Fetch misc (custom) items
-        cur.execute(
-            "SELECT name, '', quantity, unit_price, vat_rate FROM misc_items WHERE booking_id = ?",
-            (booking_id,)
-        )
-        misc = cur.fetchall()
-        # Append misc items to items list. They will have empty description.
-        items += misc
-        conn.close()
-        # Build HTML table rows and collect service names
-        item_rows = ''
-        service_names = []
-        for name, desc, qty, unit_price, vat_rate in items:
-            service_names.append(name)
-            line_total_ex = qty * unit_price
-            line_vat = line_total_ex * vat_rate
-            line_total_inc = line_total_ex + line_vat
-            item_rows += f'''<tr>
-                <td>{name}</td>
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Fetch invoice
+            cur.execute(SQL_INVOICE_VIEW, (invoice_id,))
+            row = cur.fetchone()
+            if not row:
+                self.send_error(404, 'Invoice not found')
+                return
+            (
+                inv_number, issue_date, total_ex, total_vat, total_inc, inv_status,
+                booking_id, booking_date, cust_first, cust_last, cust_phone,
+                cust_email, cust_address, vrm, make, model, mileage, has_interim
+            ) = row
+            # Fetch booking items and misc items with their line totals
+            cur.execute(SQL_INVOICE_ITEMS, (booking_id, booking_id))
+            items = cur.fetchall()
+        # Build HTML table rows
+        item_rows = ''.join(
+            f'''<tr>
+                <td>{_e(name)}</td>
                 <td>{qty}</td>
                 <td>£{unit_price:.2f}</td>
-                <td>£{line_total_ex:.2f}</td>
+                <td>£{line_ex:.2f}</td>
                 <td>£{line_vat:.2f}</td>
-                <td>£{line_total_inc:.2f}</td>
+                <td>£{line_ex + line_vat:.2f}</td>
             </tr>'''
+            for name, desc, qty, unit_price, vat_rate, line_ex, line_vat in items
+        )
         # Company settings
         settings = get_settings()
         # Compute due date based on payment terms (default 14 days)
-        try:
-            days = int(settings.get('payment_terms_days', '14'))
-        except ValueError:
-            days = 14
-        issue_dt = datetime.datetime.strptime(issue_date, '%Y-%m-%d')
-        due_dt = issue_dt + datetime.timedelta(days=days)
-        due_date = due_dt.strftime('%Y-%m-%d')
+        days = get_payment_terms_days()
+        issue_dt = _parse_ymd(issue_date)
+        due_date = (issue_dt + datetime.timedelta(days=days)).isoformat()
         # Compute next service due date (simple heuristic: 6 months if Interim Service, else 12 months)
-        months = 12
-        for name in service_names:
-            lower = name.lower()
-            if 'interim' in lower:
-                months = 6
-                break
-        next_service_dt = issue_dt + datetime.timedelta(days=30 * months)
-        next_service_date = next_service_dt.strftime('%Y-%m-%d')
+        months = 6 if has_interim else 12
+        next_service_date = (issue_dt + datetime.timedelta(days=30 * months)).isoformat()
         # Prepare HTML
         html = self.render_template(
             'invoice.html',
@@ -558,13 +795,13 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
             issue_date=issue_date,
             due_date=due_date,
             next_service_date=next_service_date,
-            customer_name=f"{cust_first} {cust_last}",
-            customer_phone=cust_phone,
-            customer_email=cust_email,
-            customer_address=cust_address,
-            vehicle_vrm=vrm,
-            vehicle_make=make,
-            vehicle_model=model,
+            customer_name=_e(f"{cust_first} {cust_last}"),
+            customer_phone=_e(cust_phone),
+            customer_email=_e(cust_email),
+            customer_address=_e(cust_address),
+            vehicle_vrm=_e(vrm),
+            vehicle_make=_e(make),
+            vehicle_model=_e(model),
             vehicle_mileage=(mileage or ''),
             items_rows=item_rows,
             total_ex=f"£{total_ex:.2f}",
@@ -575,93 +812,73 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
 
     def handle_invoice_list(self):
         """Display a list of invoices with basic details."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        # Fetch invoices joined with customers and bookings
-        cur.execute(
-            """
-            SELECT i.id, i.invoice_number, i.issue_date, i.total_inc, i.status, c.first_name, c.last_name
-            FROM invoices i
-            JOIN bookings b ON i.booking_id = b.id
-            JOIN customers c ON b.customer_id = c.id
-            ORDER BY i.issue_date DESC, i.id DESC
-            """
-        )
-        rows = cur.fetchall()
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Fetch invoices joined with customers and bookings
+            cur.execute(SQL_LIST_INVOICES)
+            rows = cur.fetchall()
         # Build table rows
-        invoice_rows = ''
-        for inv_id, inv_num, issue_date, total_inc, status, first_name, last_name in rows:
-            customer_name = f"{first_name} {last_name}".strip()
-            invoice_rows += f'''<tr>
+        invoice_rows = ''.join(
+            f'''<tr>
                 <td><a href="/invoice/{inv_id}">{inv_num}</a></td>
                 <td>{issue_date}</td>
-                <td>{customer_name}</td>
+                <td>{_e(f"{first_name} {last_name}".strip())}</td>
                 <td>£{total_inc:.2f}</td>
                 <td>{status}</td>
             </tr>'''
+            for inv_id, inv_num, issue_date, total_inc, status, first_name, last_name in rows
+        )
         # Render template
         html = self.render_template('invoice_list.html', invoice_rows=invoice_rows)
         self.respond_html(html)
 
     def handle_booking_list(self):
         """Display all bookings with status and actions."""
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        # Retrieve bookings with customer and vehicle info and invoice details
-        cur.execute(
-            """
-            SELECT b.id, b.booking_date, b.status, c.first_name, c.last_name, v.vrm,
-                   IFNULL(i.invoice_number, '') AS invoice_number, i.id AS invoice_id
-            FROM bookings b
-            JOIN customers c ON b.customer_id = c.id
-            JOIN vehicles v ON b.vehicle_id = v.id
-            LEFT JOIN invoices i ON i.booking_id = b.id
-            ORDER BY b.booking_date DESC, b.id DESC
-            """
-        )
-        rows = cur.fetchall()
-        conn.close()
-        booking_rows = ''
-        for b_id, b_date, status, first_name, last_name, vrm, inv_num, inv_id in rows:
-            customer_name = f"{first_name} {last_name}".strip()
-            # Cancel action if booking is not canceled
-            action_html = ''
-            if status != 'canceled':
-                action_html = f'''<form method="post" action="/booking/cancel" style="display:inline;"><input type="hidden" name="booking_id" value="{b_id}"><button type="submit" class="btn" onclick="return confirm('Are you sure you want to cancel this booking?');">Cancel</button></form>'''
-            # Link to invoice if exists
-            inv_link = f'<a href="/invoice/{inv_id}">{inv_num}</a>' if inv_id else ''
-            booking_rows += f'''<tr>
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Retrieve bookings with customer and vehicle info and invoice details
+            cur.execute(SQL_LIST_BOOKINGS)
+            rows = cur.fetchall()
+        # Link to the invoice if one exists and offer a cancel action unless
+        # the booking is already canceled
+        booking_rows = ''.join(
+            f'''<tr>
                 <td>{b_id}</td>
                 <td>{b_date}</td>
-                <td>{customer_name}</td>
-                <td>{vrm}</td>
+                <td>{_e(customer_name)}</td>
+                <td>{_e(vrm)}</td>
                 <td>{status}</td>
-                <td>{inv_link}</td>
-                <td>{action_html}</td>
+                <td>{f'<a href="/invoice/{inv_id}">{inv_num}</a>' if inv_id else ''}</td>
+                <td>{CANCEL_FORM_HTML.format(booking_id=b_id) if cancellable else ''}</td>
             </tr>'''
+            for b_id, b_date, status, customer_name, vrm, inv_num, inv_id, cancellable in rows
+        )
         html = self.render_template('booking_list.html', booking_rows=booking_rows)
         self.respond_html(html)
 
     def process_cancel_booking(self, fields):
         """Cancel a booking and update its invoice status."""
-        booking_id_str = fields.get('booking_id', [''])[0]
+        booking_id_str = fields.get('booking_id', '')
         try:
             booking_id = int(booking_id_str)
         except ValueError:
             self.send_error(400, 'Invalid booking ID')
             return
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        # Update booking status
-        cur.execute("UPDATE bookings SET status = 'canceled' WHERE id = ?", (booking_id,))
-        # Update associated invoice status if exists
-        cur.execute("UPDATE invoices SET status = 'canceled' WHERE booking_id = ?", (booking_id,))
-        conn.commit()
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Update booking status
+            cur.execute("UPDATE bookings SET status = 'canceled' WHERE id = ?", (booking_id,))
+            # Update associated invoice status if exists
+            cur.execute("UPDATE invoices SET status = 'canceled' WHERE booking_id = ?", (booking_id,))
+            conn.commit()
         # Redirect back to bookings page
+        self.redirect('/bookings')
+
+    def redirect(self, location):
+        """Send a 303 See Other redirect with an empty body."""
         self.send_response(303)
-        self.send_header('Location', '/bookings')
+        self.send_header('Location', location)
+        self.send_header('Content-Length', 0)
         self.end_headers()
 
     def respond_html(self, html: str):
@@ -671,14 +888,34 @@ class ServiceRequestHandler(BaseHTTPRequestHandler):
         self.send_header('Content-Type', 'text/html; charset=utf-8')
         self.send_header('Content-Length', len(encoded))
         self.end_headers()
-        self.wfile.write(encoded)
+        # Write large pages in fixed-size slices of the encoded buffer rather
+        # than handing the whole page to the socket in one call.
+        view = memoryview(encoded)
+        for start in range(0, len(view), RESPONSE_CHUNK_SIZE):
+            self.wfile.write(view[start:start + RESPONSE_CHUNK_SIZE])
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server so slow requests do not block other clients.
+
+    Each request runs in its own daemon thread and checks out its own
+    connection from the pool, so no SQLite connection is shared between
+    threads at the same time.
+    """
+
+    daemon_threads = True
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        super().server_bind()
 
 
 def run_server():
     init_db()
+    _STATIC.update(load_static_files())
     port = int(os.environ.get('PORT', 8000))
     server_address = ('', port)
-    httpd = HTTPServer(server_address, ServiceRequestHandler)
+    httpd = ServiceHTTPServer(server_address, ServiceRequestHandler)
     print(f"Starting service invoice server on http://localhost:{port}")
     try:
         httpd.serve_forever()